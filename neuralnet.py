@@ -1,7 +1,13 @@
+import numbers
+import threading
+import time
+from collections import OrderedDict, deque
+
 import numpy as np
 import pandas as pd
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
+from sklearn.model_selection import GridSearchCV
 from sklearn.preprocessing import FunctionTransformer
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import OneHotEncoder
@@ -138,10 +144,11 @@ def initialize_parameters(n_x, n_h, n_y):
     return parameters
 
 
-def initialize_parameters_deep(layer_dims):
+def initialize_parameters_deep(layer_dims, seed = 1):
     """
     Arguments:
     layer_dims -- python array (list) containing the dimensions of each layer in our network
+    seed -- seed of the random generator used for the weights
 
     Returns:
     parameters -- python dictionary containing your parameters "W1", "b1", ..., "WL", "bL":
@@ -149,12 +156,12 @@ def initialize_parameters_deep(layer_dims):
                     bl -- bias vector of shape (layer_dims[l], 1)
     """
 
-    np.random.seed(1)
+    rng = np.random.RandomState(seed)  # local generator, safe to use from parallel workers
     parameters = {}
     L = len(layer_dims)            # number of layers in the network
 
     for l in range(1, L):
-        parameters['W' + str(l)] = np.random.randn(layer_dims[l], layer_dims[l-1]) / np.sqrt(layer_dims[l-1]) #*0.01
+        parameters['W' + str(l)] = rng.randn(layer_dims[l], layer_dims[l-1]) / np.sqrt(layer_dims[l-1]) #*0.01
         parameters['b' + str(l)] = np.zeros((layer_dims[l], 1))
 
         assert(parameters['W' + str(l)].shape == (layer_dims[l], layer_dims[l-1]))
@@ -376,6 +383,66 @@ def update_parameters(parameters, grads, learning_rate):
 
     return parameters
 
+def initialize_adam(parameters):
+    """
+    Initializes v and s as two python dictionaries with:
+                - keys: "dW1", "db1", ..., "dWL", "dbL"
+                - values: numpy arrays of zeros of the same shape as the corresponding gradients/parameters.
+
+    Arguments:
+    parameters -- python dictionary containing your parameters
+
+    Returns:
+    v -- python dictionary that will contain the exponentially weighted average of the gradient.
+    s -- python dictionary that will contain the exponentially weighted average of the squared gradient.
+    """
+
+    L = len(parameters) // 2 # number of layers in the neural network
+    v = {}
+    s = {}
+
+    for l in range(L):
+        v["dW" + str(l+1)] = np.zeros(parameters["W" + str(l+1)].shape)
+        v["db" + str(l+1)] = np.zeros(parameters["b" + str(l+1)].shape)
+        s["dW" + str(l+1)] = np.zeros(parameters["W" + str(l+1)].shape)
+        s["db" + str(l+1)] = np.zeros(parameters["b" + str(l+1)].shape)
+
+    return v, s
+
+def update_parameters_with_adam(parameters, grads, v, s, t, learning_rate = 0.01,
+                                beta1 = 0.9, beta2 = 0.999, epsilon = 1e-8):
+    """
+    Update parameters using Adam
+
+    Arguments:
+    parameters -- python dictionary containing your parameters
+    grads -- python dictionary containing your gradients, output of L_model_backward
+    v -- Adam variable, moving average of the first gradient, python dictionary
+    s -- Adam variable, moving average of the squared gradient, python dictionary
+    t -- number of Adam steps taken so far, starting at 1
+    learning_rate -- the learning rate, scalar.
+    beta1 -- Exponential decay hyperparameter for the first moment estimates
+    beta2 -- Exponential decay hyperparameter for the second moment estimates
+    epsilon -- hyperparameter preventing division by zero in Adam updates
+
+    Returns:
+    parameters -- python dictionary containing your updated parameters
+    v -- Adam variable, moving average of the first gradient, python dictionary
+    s -- Adam variable, moving average of the squared gradient, python dictionary
+    """
+
+    L = len(parameters) // 2 # number of layers in the neural network
+
+    for l in range(L):
+        for g in ("dW" + str(l+1), "db" + str(l+1)):
+            v[g] = beta1 * v[g] + (1 - beta1) * grads[g]
+            s[g] = beta2 * s[g] + (1 - beta2) * np.square(grads[g])
+            v_corrected = v[g] / (1 - beta1 ** t)
+            s_corrected = s[g] / (1 - beta2 ** t)
+            parameters[g[1:]] = parameters[g[1:]] - learning_rate * v_corrected / (np.sqrt(s_corrected) + epsilon)
+
+    return parameters, v, s
+
 def predict(X, y, parameters):
     """
     This function is used to predict the results of a  L-layer neural network.
@@ -453,7 +520,7 @@ def print_mislabeled_images(classes, X, y, p):
         plt.title("Prediction: " + classes[int(p[0,index])].decode("utf-8") + " \n Class: " + classes[y[0,index]].decode("utf-8"))
 
 
-def L_layer_model(X, Y, layers_dims, learning_rate = 0.0075, num_iterations = 300, print_cost=False):#lr was 0.009
+def L_layer_model(X, Y, layers_dims, learning_rate = 0.0075, num_iterations = 300, print_cost=False, optimizer = "gd", seed = 1):#lr was 0.009
     """
     Implements a L-layer neural network: [LINEAR->RELU]*(L-1)->LINEAR->SIGMOID.
 
@@ -464,15 +531,21 @@ def L_layer_model(X, Y, layers_dims, learning_rate = 0.0075, num_iterations = 30
     learning_rate -- learning rate of the gradient descent update rule
     num_iterations -- number of iterations of the optimization loop
     print_cost -- if True, it prints the cost every 100 steps
+    optimizer -- "gd" for plain gradient descent or "adam"
+    seed -- seed used to initialize the weights
 
     Returns:
     parameters -- parameters learnt by the model. They can then be used to predict.
     """
 
-    np.random.seed(1)
+    if optimizer not in ("gd", "adam"):
+        raise ValueError("optimizer must be 'gd' or 'adam', got %r" % (optimizer,))
+
     costs = []                         # keep track of cost
 
-    parameters = initialize_parameters_deep(layers_dims)
+    parameters = initialize_parameters_deep(layers_dims, seed)
+    if optimizer == "adam":
+        v, s = initialize_adam(parameters)
 
 
     # Loop (gradient descent)
@@ -492,7 +565,10 @@ def L_layer_model(X, Y, layers_dims, learning_rate = 0.0075, num_iterations = 30
 
         # Update parameters.
 
-        parameters = update_parameters(parameters, grads, learning_rate)
+        if optimizer == "adam":
+            parameters, v, s = update_parameters_with_adam(parameters, grads, v, s, i + 1, learning_rate)
+        else:
+            parameters = update_parameters(parameters, grads, learning_rate)
 
         # Print the cost every 100 training example
         if print_cost and i % 100 == 0:
@@ -578,27 +654,168 @@ def set_data():
     return train_x, train_y, test_x, test_data
 
 
-from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.preprocessing import LabelEncoder
+from sklearn.utils.multiclass import check_classification_targets
+from sklearn.utils.validation import check_is_fitted, validate_data
+
+
+class _PredictionCache:
+    """
+    Thread-safe LRU/TTL store of the predictions memoized by titanic_NN.predict.
+    entries -- OrderedDict key -> (encoded prediction, insertion time), least recently used first
+    expiry -- deque of (insertion time, key) in insertion order, only filled when a ttl is set
+    hits -- rows answered without a forward column of their own
+    misses -- distinct feature vectors that went through the forward pass
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.expiry = deque()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock']               # locks can't be pickled
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def lookup(self, keys, ttl):
+        """
+        Returns the cached values for keys (0 where missing) and a dictionary
+        key -> row indices of the distinct keys that need the forward pass.
+        """
+        values = np.zeros(len(keys))
+        misses = {}
+        with self.lock:
+            now = time.monotonic()
+            for i, key in enumerate(keys):
+                entry = self.entries.get(key)
+                if entry is not None and (ttl is None or now - entry[1] <= ttl):
+                    self.entries.move_to_end(key)
+                    values[i] = entry[0]
+                    self.hits += 1
+                elif key in misses:
+                    # duplicate of a miss in this call, it shares that forward column
+                    misses[key].append(i)
+                    self.hits += 1
+                else:
+                    misses[key] = [i]
+                    self.misses += 1
+
+        return values, misses
+
+    def store(self, items, size, ttl):
+        with self.lock:
+            now = time.monotonic()
+            for key, value in items:
+                self.entries[key] = (value, now)
+                self.entries.move_to_end(key)
+                if ttl is not None:
+                    self.expiry.append((now, key))
+            if ttl is not None:
+                # hits don't re-stamp entries, so insertion order is expiry order
+                while self.expiry and now - self.expiry[0][0] > ttl:
+                    stamp, key = self.expiry.popleft()
+                    entry = self.entries.get(key)
+                    if entry is not None and entry[1] == stamp:
+                        del self.entries[key]
+            while self.entries and len(self.entries) > size:
+                self.entries.popitem(last=False)
+
+
+class titanic_NN(ClassifierMixin, BaseEstimator):
+    """
+    Binary sklearn classifier around L_layer_model, safe to clone and to use in GridSearchCV with n_jobs.
+    The network is built in fit as [n_features, *hidden_layers_dims, 1].
+    Arguments:
+    hidden_layers_dims -- tuple containing the size of each hidden layer
+    num_iterations -- number of iterations of the optimization loop
+    learning_rate -- learning rate of the update rule
+    optimizer -- "gd" for plain gradient descent or "adam"
+    seed -- seed used to initialize the weights
+    cache_size -- max number of feature vectors whose prediction is memoized, None disables the cache
+    cache_ttl -- seconds a memoized prediction stays valid, None means no expiry
+
+    fit creates the cache_ store and with it the cache_hits_/cache_misses_ counters, they do not exist before.
+    cache_misses_ counts the distinct feature vectors sent through the forward pass, cache_hits_ every other row.
+    predict can be called from several threads sharing one fitted model.
+    """
+
+    def __init__(self, hidden_layers_dims = (25, 35, 40), num_iterations = 100, learning_rate = 0.0075,
+                 optimizer = "gd", seed = 1, cache_size = None, cache_ttl = None):
+        self.hidden_layers_dims = hidden_layers_dims
+        self.num_iterations = num_iterations
+        self.learning_rate = learning_rate
+        self.optimizer = optimizer
+        self.seed = seed
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+
+    def __sklearn_tags__(self):
+        tags = super().__sklearn_tags__()
+        tags.classifier_tags.multi_class = False
+        return tags
 
+    def fit(self, X, y):
 
-class titanic_NN(BaseEstimator, TransformerMixin):
+        if self.cache_size is not None and (isinstance(self.cache_size, bool) or not isinstance(self.cache_size, numbers.Integral) or self.cache_size < 0):
+            raise ValueError("cache_size must be None or a non-negative int, got %r" % (self.cache_size,))
+        if self.cache_ttl is not None and (not isinstance(self.cache_ttl, numbers.Real) or self.cache_ttl < 0):
+            raise ValueError("cache_ttl must be None or a non-negative number, got %r" % (self.cache_ttl,))
+
+        X, y = validate_data(self, X, y, dtype=np.float64)
+        check_classification_targets(y)
+        encoder = LabelEncoder()
+        y = encoder.fit_transform(y)
+        self.classes_ = encoder.classes_
+        if len(self.classes_) != 2:
+            raise ValueError("Only binary classification is supported, got %d classes" % len(self.classes_))
+
+        layers_dims = [X.shape[1], *self.hidden_layers_dims, 1]
+        self.parameters_ = L_layer_model(X.T, y.reshape(1, -1), layers_dims = layers_dims, learning_rate = self.learning_rate,
+                                         num_iterations = self.num_iterations, optimizer = self.optimizer, seed = self.seed)
+        # the parameters changed, so every memoized prediction is stale
+        self.clear_cache()
 
-    def __init__(self, Layers_dim= [7, 25, 35, 40, 1], num_it = 100):
-        self.layers_dims = Layers_dim
-        self.num_iterations = num_it
+        return self
 
-    def fit(self, X, y):
+    def clear_cache(self):
+        self.cache_ = _PredictionCache()
 
-        self.parameters = L_layer_model(np.transpose(np.array(X)), np.transpose(y),layers_dims = self.layers_dims, num_iterations = self.num_iterations)
+    @property
+    def cache_hits_(self):
+        return self.cache_.hits
 
-        return self
+    @property
+    def cache_misses_(self):
+        return self.cache_.misses
 
-    def predict(self, X, y=None):
+    def predict(self, X):
 
-        return predict_test(np.transpose(np.array(X)), self.parameters).T
+        check_is_fitted(self)
+        X = np.ascontiguousarray(validate_data(self, X, dtype=np.float64, reset=False))
+        if not self.cache_size:
+            return self.classes_[predict_test(X.T, self.parameters_)[0].astype(int)]
+
+        keys = [row.tobytes() for row in X]
+        p, misses = self.cache_.lookup(keys, self.cache_ttl)
+
+        if misses:
+            # one batched forward pass over the distinct missing rows, outside the lock
+            first = [rows[0] for rows in misses.values()]
+            p_miss = predict_test(X[first].T, self.parameters_)[0]
+            for rows, value in zip(misses.values(), p_miss):
+                p[rows] = value
+            self.cache_.store(zip(misses, p_miss), self.cache_size, self.cache_ttl)
+
+        return self.classes_[p.astype(int)]
 
-    def score(self, X, y):
-        return np.abs((self.predict(X) - np.transpose(y))[0]).sum() / len(y)
 def titanic_ColumnTransformer(titanic):
 
     def gettitle(name):
@@ -630,40 +847,24 @@ def titanic_ColumnTransformer(titanic):
     return preproc.fit_transform(titanic)
 
 
-def find_NN_layers():
+def find_NN_layers(first = range(20, 50), second = range(1, 50), third = range(1, 50), cv = 5, n_jobs = -1):
+    """
+    Grid search over three hidden layer sizes with GridSearchCV.
+    The default grid is 30*49*49 = 72030 candidates, i.e. about 360k fits with cv=5,
+    so n_jobs only spreads that cost over cores; pass narrower ranges for a quick sweep.
+    """
     data = pd.read_csv("train.csv")
     data = data.drop(columns = ['Ticket', 'Cabin', 'Embarked']).set_index('PassengerId')
     data = data.dropna()
     y = data['Survived']
     data = data.drop(columns = ['Survived'])
-    X_train, X_test, y_train, y_test = train_test_split(titanic_ColumnTransformer(data), y)
-    maxa=0
-    maxi=0
-    maxj = 0
-    maxk = 0
-    for i in range(20, 50):
-        for j in range(0, 50):
-            print(i, j)
-            for k in range(0, 50):
-                layers_dims = [9, i,j,k, 1]
-                a = titanic_NN(layers_dims, 100)
-                a.fit(X_train,(np.array(y_train)).reshape(len(y_train),1))
-                score = a.score(X_test,(np.array(y_test)).reshape(len(y_test),1))
-
-                if maxa < score:
-                    X_train1, X_test1, y_train1, y_test1 = train_test_split(titanic_ColumnTransformer(data), y)
-                    a = titanic_NN(layers_dims, 100)
-                    a.fit(X_train1,(np.array(y_train1)).reshape(len(y_train1),1))
-                    score = a.score(X_test1,(np.array(y_test1)).reshape(len(y_test1),1))
-                    if maxa < score:
-
-                        maxa = score
-                        maxi = i
-                        maxj = j
-                        maxk = k
-                        print(maxa,maxi, maxj, maxk)
+    X = titanic_ColumnTransformer(data)
+    param_grid = {'hidden_layers_dims': [(i, j, k) for i in first for j in second for k in third]}
+    search = GridSearchCV(titanic_NN(num_iterations = 100), param_grid, cv = cv, n_jobs = n_jobs)
+    search.fit(X, y)
+    maxi, maxj, maxk = search.best_params_['hidden_layers_dims']
 
-    return maxa,maxi, maxj, maxk
+    return search.best_score_, maxi, maxj, maxk
 
 '''
 
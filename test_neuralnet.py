@@ -0,0 +1,165 @@
+import os
+import pickle
+import threading
+import time
+
+import numpy as np
+import pytest
+from sklearn.base import clone
+from sklearn.exceptions import NotFittedError
+from sklearn.model_selection import GridSearchCV
+from sklearn.utils.estimator_checks import parametrize_with_checks
+
+from neuralnet import find_NN_layers, titanic_NN
+
+
+@pytest.fixture
+def data():
+    rng = np.random.RandomState(0)
+    X = rng.randint(0, 3, (200, 7)).astype(float)
+    y = (X.sum(axis=1) > 7).astype(int)
+    return X, y
+
+
+def test_cached_predictions_match_uncached(data):
+    X, y = data
+    cached = titanic_NN(cache_size=50).fit(X, y)
+    plain = titanic_NN().fit(X, y)
+
+    np.testing.assert_array_equal(cached.predict(X), plain.predict(X))
+    np.testing.assert_array_equal(cached.predict(X), plain.predict(X))
+
+
+def test_cache_counters_and_eviction(data):
+    X, y = data
+    model = titanic_NN(cache_size=5).fit(X, y)
+    assert (model.cache_hits_, model.cache_misses_) == (0, 0)
+
+    model.predict(X[:3])
+    assert (model.cache_hits_, model.cache_misses_) == (0, 3)
+    model.predict(X[:3])
+    assert (model.cache_hits_, model.cache_misses_) == (3, 3)
+
+    model.predict(X[3:10])
+    assert len(model.cache_.entries) == 5
+    # the least recently used rows were evicted
+    assert X[0].tobytes() not in model.cache_.entries
+    assert X[9].tobytes() in model.cache_.entries
+
+
+def test_duplicate_rows_share_one_miss_entry(data):
+    X, y = data
+    model = titanic_NN(cache_size=10).fit(X, y)
+    model.predict(np.repeat(X[:1], 4, axis=0))
+    # one forward column for the distinct vector, the three duplicates reuse it
+    assert (model.cache_hits_, model.cache_misses_) == (3, 1)
+    assert len(model.cache_.entries) == 1
+
+
+def test_fit_invalidates_cache(data):
+    X, y = data
+    model = titanic_NN(cache_size=50).fit(X, y)
+    model.predict(X)
+    model.fit(X, y)
+    assert len(model.cache_.entries) == 0
+    assert (model.cache_hits_, model.cache_misses_) == (0, 0)
+
+
+def test_expired_entries_are_pruned(data):
+    X, y = data
+    model = titanic_NN(cache_size=100, cache_ttl=0.01).fit(X, y)
+    model.predict(X[:5])
+    time.sleep(0.02)
+    model.predict(X[5:6])
+    assert list(model.cache_.entries) == [X[5].tobytes()]
+    assert list(model.cache_.expiry) == [(model.cache_.entries[X[5].tobytes()][1], X[5].tobytes())]
+
+
+def test_concurrent_predicts_share_one_cache(data):
+    X, y = data
+    model = titanic_NN(cache_size=20, cache_ttl=0.001).fit(X, y)
+    expected = titanic_NN().fit(X, y).predict(X)
+    errors = []
+
+    def worker(seed):
+        rng = np.random.RandomState(seed)
+        try:
+            for _ in range(50):
+                rows = rng.randint(0, len(X), 16)
+                np.testing.assert_array_equal(model.predict(X[rows]), expected[rows])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert len(model.cache_.entries) <= 20
+
+
+def test_cached_model_pickles(data):
+    X, y = data
+    model = titanic_NN(cache_size=10).fit(X, y)
+    model.predict(X[:5])
+    restored = pickle.loads(pickle.dumps(model))
+    assert (restored.cache_hits_, restored.cache_misses_) == (model.cache_hits_, model.cache_misses_)
+    np.testing.assert_array_equal(restored.predict(X[:5]), model.predict(X[:5]))
+    assert restored.cache_hits_ == 5
+
+
+@pytest.mark.parametrize("params", [{"cache_size": -1}, {"cache_size": 1.5}, {"cache_ttl": -1}])
+def test_invalid_cache_settings_rejected(data, params):
+    X, y = data
+    with pytest.raises(ValueError):
+        titanic_NN(**params).fit(X, y)
+
+
+@parametrize_with_checks([titanic_NN(), titanic_NN(cache_size=100, cache_ttl=60)])
+def test_sklearn_compatible_estimator(estimator, check):
+    check(estimator)
+
+
+def test_clone_round_trips_params():
+    model = titanic_NN(hidden_layers_dims=(5, 3), num_iterations=10, learning_rate=0.01,
+                       optimizer="adam", seed=3, cache_size=8, cache_ttl=1.0)
+    assert clone(model).get_params() == model.get_params()
+
+
+def test_input_width_comes_from_data(data):
+    X, y = data
+    X = np.hstack([X, X[:, :2]])
+    model = titanic_NN(hidden_layers_dims=(4,)).fit(X, y)
+    assert model.parameters_["W1"].shape == (4, 9)
+    assert model.parameters_["W2"].shape == (1, 4)
+
+
+def test_predict_returns_original_labels(data):
+    X, y = data
+    labels = np.where(y == 1, "yes", "no")
+    model = titanic_NN(cache_size=10).fit(X, labels)
+    assert set(model.predict(X)) <= {"yes", "no"}
+    np.testing.assert_array_equal(model.predict(X) == "yes", titanic_NN().fit(X, y).predict(X) == 1)
+
+
+def test_predict_before_fit_raises(data):
+    X, _ = data
+    with pytest.raises(NotFittedError):
+        titanic_NN().predict(X)
+
+
+def test_grid_search_runs_in_parallel(data):
+    X, y = data
+    grid = {"hidden_layers_dims": [(5,), (10, 5)], "optimizer": ["gd", "adam"]}
+    search = GridSearchCV(titanic_NN(num_iterations=50), grid, cv=3, n_jobs=2).fit(X, y)
+    assert search.best_params_["hidden_layers_dims"] in grid["hidden_layers_dims"]
+    assert 0 <= search.best_score_ <= 1
+
+
+def test_find_NN_layers_small_grid(monkeypatch):
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(__file__)))
+    score, i, j, k = find_NN_layers(first=[5], second=[3], third=[2, 4], cv=2, n_jobs=2)
+    assert 0 <= score <= 1
+    assert (i, j) == (5, 3) and k in (2, 4)